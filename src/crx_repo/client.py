@@ -9,12 +9,23 @@ from aiohttp import ClientError
 from pathlib import Path
 from urllib.parse import urlencode
 from aiohttp.client import ClientSession
+from aiohttp.client import ClientResponse
 from defusedxml.ElementTree import fromstring  # pyright: ignore[reportUnknownVariableType]
 
 
 _logger = logging.getLogger(__name__)
 
 
+def _version_tuple(version: str) -> tuple[int, ...]:
+    parts: list[int] = []
+    for part in version.split("."):
+        try:
+            parts.append(int(part))
+        except ValueError:
+            parts.append(0)
+    return tuple(parts)
+
+
 class UpdateInfo(NamedTuple):
     """A named tuple stores update info from api."""
     url: str
@@ -87,26 +98,35 @@ class ExtensionDownloader:
                     _logger.warning("No size is provided in api response.")
                 elif response.content_length != update.size:
                     _logger.warning("Content-Length is not equals to size returned by API.")
-                hash_calculator = hashlib.sha256()
                 extension_path = self.cache_path / (update.version + ".crx.part")
-                with extension_path.open("wb") as writer:
-                    try:
-                        async for chunk in response.content.iter_chunked(self.CHUNK_SIZE_BYTES):
-                            chunk_size = writer.write(chunk)
-                            hash_calculator.update(chunk)
-                            _logger.debug(
-                                "Writing %s byte(s) into %s...",
-                                chunk_size,
-                                extension_path,
-                            )
-                    except ClientError as e:
-                        _logger.error("Failed to download because %s.", e)
-                    except asyncio.TimeoutError:
-                        _logger.error("Failed to build because async operation timeout.")
+                sha256_hash = await self._save_response(response, extension_path)
                 _logger.debug("Checking checksums of extension %s...", self.extension_id)
-                sha256_hash = hash_calculator.hexdigest()
                 self._after_extension_downloaded(update, sha256_hash, extension_path)
 
+    async def _save_response(
+        self,
+        response: ClientResponse,
+        extension_path: Path,
+    ) -> str:
+        hash_calculator = hashlib.sha256()
+        debug_enabled = _logger.isEnabledFor(logging.DEBUG)
+        with extension_path.open("wb") as writer:
+            try:
+                async for chunk in response.content.iter_chunked(self.CHUNK_SIZE_BYTES):
+                    chunk_size = writer.write(chunk)
+                    hash_calculator.update(chunk)
+                    if debug_enabled:
+                        _logger.debug(
+                            "Writing %s byte(s) into %s...",
+                            chunk_size,
+                            extension_path,
+                        )
+            except ClientError as e:
+                _logger.error("Failed to download because %s.", e)
+            except asyncio.TimeoutError:
+                _logger.error("Failed to build because async operation timeout.")
+        return hash_calculator.hexdigest()
+
     def _after_extension_downloaded(
         self,
         update: UpdateInfo,
@@ -190,21 +210,12 @@ class ExtensionDownloader:
         current_version = self._get_current_version()
         if current_version is None:
             return True
-        current_versions = current_version.split(".")
-        versions = version.split(".")
-        max_count = max(len(current_versions), len(versions))
-        for i in range(max_count):
-            try:
-                current_version_value = int(current_versions[i]) if len(current_versions) > i else 0
-            except ValueError:
-                current_version_value = 0
-            try:
-                versions_value = int(versions[i]) if len(versions) > i else 0
-            except ValueError:
-                versions_value = 0
-            if versions_value > current_version_value:
-                return True
-        return False
+        current = _version_tuple(current_version)
+        candidate = _version_tuple(version)
+        length = max(len(current), len(candidate))
+        current += (0,) * (length - len(current))
+        candidate += (0,) * (length - len(candidate))
+        return candidate > current
 
     def _get_current_version(self) -> str | None:
         paths = self.cache_path.glob("*.crx")
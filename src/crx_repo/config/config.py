@@ -8,14 +8,14 @@ from dataclasses import dataclass
 type LogLevelType = Literal["NOTSET", "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
 
 
-@dataclass
+@dataclass(slots=True)
 class TlsHttpListenConfig:
     """HTTPS config."""
     cert: str = "crx-repo.crt"
     key: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class UnixListenConfig:
     """Unix domain socket config."""
     path: str = "/run/crx-repo/crx-repo.socket"
@@ -23,7 +23,7 @@ class UnixListenConfig:
     tls: TlsHttpListenConfig | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class TcpListenConfig:
     """TCP config."""
     address: str = "127.0.0.1"
@@ -31,14 +31,14 @@ class TcpListenConfig:
     tls: TlsHttpListenConfig | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class ListenConfig:
     """Listen config."""
     tcp: TcpListenConfig | None = None
     unix: UnixListenConfig | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Config:
     """Main runtime config."""
     log_level: LogLevelType = "INFO"
@@ -2,12 +2,14 @@
 
 # pyright: reportAny=false
 
+import os
 import logging
 from abc import ABC
 from abc import abstractmethod
 from typing import Callable
 from typing import overload
 from pathlib import Path
+from collections import OrderedDict
 from crx_repo.config.config import Config
 
 
@@ -17,13 +19,38 @@ type KeyConverterType = Callable[[str], str] | None
 
 _logger = logging.getLogger(__name__)
 
+_CACHE_SIZE_ENV = "CRX_REPO_PARSER_CACHE_SIZE"
+_CACHE_SIZE_DEFAULT = 128
+
+
+def _get_cache_size() -> int:
+    try:
+        return int(os.environ.get(_CACHE_SIZE_ENV, _CACHE_SIZE_DEFAULT))
+    except ValueError:
+        return _CACHE_SIZE_DEFAULT
+
 
 class ConfigParser(ABC):
     """Class to parse config."""
     def __init__(self):
         """Initialize class with no parameter."""
         super().__init__()
-        self._cache: dict[Path, Config] = {}
+        self._cache: OrderedDict[str, Config] = OrderedDict()
+        self._cache_maxsize: int = _get_cache_size()
+
+    def _get_cached_config(self, path: str) -> Config | None:
+        """Get a cached config and mark it as recently used."""
+        config = self._cache.get(path)
+        if config is not None:
+            self._cache.move_to_end(path)
+        return config
+
+    def _set_cached_config(self, path: str, config: Config):
+        """Cache a parsed config, evicting the least recently used one if full."""
+        self._cache[path] = config
+        self._cache.move_to_end(path)
+        while len(self._cache) > self._cache_maxsize:
+            _ = self._cache.popitem(last=False)
 
     @overload
     async def parse_async(self, path: str) -> Config:
@@ -1,5 +1,7 @@
 """ConfigParser implementation to parse toml config."""
 
+import os
+import asyncio
 import tomllib
 from typing import Any
 from typing import override
@@ -10,24 +12,38 @@ from crx_repo.config.parser.parser import PathOrStr
 from crx_repo.config.parser.parser import ConfigParser
 
 
+_config_adapter = TypeAdapter(Config)
+
+
+def _parse_toml(content: str) -> Config:
+    config_raw = tomllib.loads(content)
+    converted_config: dict[str, Any] = {}
+    for key in config_raw:
+        converted_config[key.replace("-", "_").lower()] = config_raw[key]
+    return _config_adapter.validate_python(converted_config)
+
+
+def _parse_file(path: str) -> Config:
+    return _parse_toml(Path(path).read_text(encoding="utf-8"))
+
+
 class TomlConfigParser(ConfigParser):
     """Class to parse toml config."""
+    @staticmethod
+    def parse_bytes(content: bytes) -> Config:
+        """Deserialize config from toml content already in memory."""
+        return _parse_toml(content.decode())
+
     @override
     async def parse_async(self, path: PathOrStr) -> Config:
-        if isinstance(path, str):
-            path = Path(path)
-        if path not in self._cache:
-            content = path.read_text()
-            config_raw = tomllib.loads(content)
-            t = TypeAdapter(Config)
-            converted_config: dict[str, Any] = {}
-            for key in config_raw:
-                converted_config[key.replace("-", "_").lower()] = config_raw[key]
-            self._cache[path] = t.validate_python(converted_config)
-        return self._cache[path]
+        cache_key = path if isinstance(path, str) else os.fspath(path)
+        config = self._get_cached_config(cache_key)
+        if config is None:
+            config = await asyncio.to_thread(_parse_file, cache_key)
+            self._set_cached_config(cache_key, config)
+        return config
 
     @override
     async def support_async(self, path: PathOrStr) -> bool:
-        if isinstance(path, str):
-            path = Path(path)
-        return path.name.endswith(".toml")
+        name = path if isinstance(path, str) else path.name
+        return name.lower().endswith(".toml")
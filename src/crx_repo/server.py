@@ -4,12 +4,15 @@
 # pyright: reportUnknownVariableType=false
 # pyright: reportAny=false
 
+import os
+import signal
 import asyncio
 import hashlib
 import logging
 from ssl import Purpose
 from ssl import SSLContext
 from ssl import create_default_context
+from http import HTTPStatus
 from typing import Any
 from typing import Callable
 from typing import NamedTuple
@@ -18,16 +21,19 @@ from asyncio import Task
 from asyncio import CancelledError
 from asyncio import create_task
 from pathlib import Path
+from functools import lru_cache
+from itertools import chain
+from contextlib import suppress
 from watchfiles import Change
 from watchfiles import awatch
+from collections import defaultdict
 from urllib.parse import unquote
+from urllib.parse import parse_qsl
 from collections.abc import Iterator
 from collections.abc import Coroutine
 from collections.abc import AsyncIterator
 from crx_repo.client import ExtensionDownloader
-from xml.etree.ElementTree import Element
-from xml.etree.ElementTree import indent
-from xml.etree.ElementTree import tostring
+from xml.sax.saxutils import quoteattr
 from crx_repo.config.config import Config
 from crx_repo.config.config import TlsHttpListenConfig
 
@@ -41,70 +47,95 @@ class ExtensionInfo(NamedTuple):
 
 
 _logger = logging.getLogger(__name__)
-_cache: set[ExtensionInfo] = set()
+_by_id: defaultdict[str, dict[str, ExtensionInfo]] = defaultdict(dict)
+_cache_version = 0
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>\n'
+_XML_ROOT_OPEN = '<gupdate xmlns="http://www.google.com/update2/response" protocol="2.0">'
 
 
 def _iter_extension_info(
     target_extension_id: str | None = None,
     target_extension_version: str | None = None,
 ) -> Iterator[ExtensionInfo]:
-    for info in _cache:
-        if target_extension_id is not None:
-            extension_id_match = info.extension_id == target_extension_id
-        else:
-            extension_id_match = True
-
+    if target_extension_id is not None:
+        versions = _by_id.get(target_extension_id)
+        if versions is None:
+            return
         if target_extension_version is not None:
-            extension_version_match = info.version == target_extension_version
+            info = versions.get(target_extension_version)
+            if info is not None:
+                yield info
         else:
-            extension_version_match = True
+            yield from versions.values()
+    elif target_extension_version is not None:
+        for versions in _by_id.values():
+            info = versions.get(target_extension_version)
+            if info is not None:
+                yield info
+    else:
+        yield from chain.from_iterable(versions.values() for versions in _by_id.values())
 
-        if extension_id_match and extension_version_match:
-            yield info
+
+@lru_cache(maxsize=None)
+def _make_ssl_context(cert: str, key: str | None) -> SSLContext:
+    context = create_default_context(Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    context.set_alpn_protocols(["http/1.1"])
+    return context
 
 
 def _get_ssl_context(tls: TlsHttpListenConfig | None) -> SSLContext | None:
     if tls is not None:
-        context = create_default_context(Purpose.CLIENT_AUTH)
-        context.load_cert_chain(tls.cert, tls.key)
-        return context
+        return _make_ssl_context(tls.cert, tls.key)
     return None
 
 
-def _parse_params(params: str) -> dict[str, str | None]:
-    equal = "="
-    ampersand = "&"
-    kv_required_min_size = 2
-    result: dict[str, str | None] = {}
-    for param in params.split(ampersand):
-        splited = param.split(equal, 1)
-        if len(splited) < kv_required_min_size:
-            result[splited[0]] = None
-        else:
-            result[splited[0]] = splited[1]
-    return result
+@lru_cache(maxsize=4096)
+def _parse_x(x: str) -> tuple[str | None, str | None]:
+    x_unquoted = unquote(x)
+    if "id=" not in x_unquoted or "v=" not in x_unquoted:
+        return None, None
+    params = dict(parse_qsl(x_unquoted, keep_blank_values=True))
+    return params.get("id"), params.get("v")
 
 
 def _get_filters(xs: list[str]) -> list[tuple[str, str]]:
     filters: list[tuple[str, str]] = []
-    _logger.debug("Handling query param %s.", xs)
     for x in xs:
-        x_unquoted = unquote(x)
-        params = _parse_params(x_unquoted)
-        crx = params.get("id")
-        version = params.get("v")
+        crx, version = _parse_x(x)
         if crx is not None and version is not None:
             filters.append((crx, version))
     return filters
 
 
+def _hash_file(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _hash_file_cached(path: Path) -> tuple[int, str]:
+    sidecar_field_count = 3
+    st = path.stat()
+    sidecar = path.with_name(path.name + ".sha256")
+    if sidecar.is_file():
+        fields = sidecar.read_text().split()
+        if len(fields) == sidecar_field_count and \
+                fields[0] == str(st.st_size) and fields[1] == str(st.st_mtime_ns):
+            return st.st_size, fields[2]
+    digest = _hash_file(path)
+    _ = sidecar.write_text("{} {} {}\n".format(st.st_size, st.st_mtime_ns, digest))
+    return st.st_size, digest
+
+
 def _watch_filter(change: Change, path: str) -> bool:
     return change != Change.modified and path.endswith(".crx")
 
 
 async def _watch_cache(cache: Path):
+    global _cache_version
     try:
-        async for changes in awatch(cache, watch_filter=_watch_filter):
+        async for changes in awatch(cache, watch_filter=_watch_filter, step=500):
             for (change, path) in changes:
                 _logger.debug("Updating cache for path %s", path)
                 p = Path(path)
@@ -112,16 +143,26 @@ async def _watch_cache(cache: Path):
                 extension_id = p.parent.stem
                 match change:
                     case Change.added:
+                        extension_size, extension_hash_sha256 = await asyncio.to_thread(
+                            _hash_file_cached,
+                            p,
+                        )
                         info = ExtensionInfo(
                             extension_id,
                             extension_version,
-                            p.stat().st_size,
-                            hashlib.sha256(p.read_bytes()).hexdigest()
+                            extension_size,
+                            extension_hash_sha256
                         )
-                        _cache.add(info)
+                        _by_id[extension_id][extension_version] = info
+                        _cache_version += 1
                     case Change.deleted:
-                        for info in _iter_extension_info(extension_id, extension_version):
-                            _cache.remove(info)
+                        p.with_name(p.name + ".sha256").unlink(missing_ok=True)
+                        versions = _by_id.get(extension_id)
+                        if versions is not None:
+                            _ = versions.pop(extension_version, None)
+                            if len(versions) == 0:
+                                _ = _by_id.pop(extension_id, None)
+                        _cache_version += 1
                     case _:
                         pass
     except CancelledError:
@@ -129,29 +170,53 @@ async def _watch_cache(cache: Path):
 
 
 async def _block():
-    sleep_seconds = 3600
-    while True:
-        try:
-            await asyncio.sleep(sleep_seconds)
-        except CancelledError:
-            _logger.info("Exiting...")
-            return
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    signals = (signal.SIGINT, signal.SIGTERM)
+    try:
+        for s in signals:
+            loop.add_signal_handler(s, stop_event.set)
+    except NotImplementedError:
+        _logger.debug("Signal handlers are not supported on this platform.")
+    try:
+        await stop_event.wait()
+    except CancelledError:
+        pass
+    finally:
+        for s in signals:
+            with suppress(NotImplementedError):
+                loop.remove_signal_handler(s)
+    _logger.info("Exiting...")
+
+
+def _iter_crx(root: Path) -> Iterator[Path]:
+    with os.scandir(root) as directories:
+        for directory in directories:
+            if not directory.is_dir():
+                continue
+            with os.scandir(directory.path) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(".crx"):
+                        yield Path(entry.path)
+
+
+def _hash_one(path: Path) -> ExtensionInfo:
+    extension_size, extension_hash_sha256 = _hash_file_cached(path)
+    return ExtensionInfo(
+        path.parent.stem,
+        path.stem,
+        extension_size,
+        extension_hash_sha256,
+    )
 
 
-def _gen_cache(cache: Path):
-    for path in cache.glob("./*/*.crx"):
-        extension_version = path.stem
-        extension_id = path.parent.stem
-        extension_size = path.stat().st_size
-        extension_hash_sha256 = hashlib.sha256(path.read_bytes()).hexdigest()
-        _cache.add(
-            ExtensionInfo(
-                extension_id,
-                extension_version,
-                extension_size,
-                extension_hash_sha256,
-            )
-        )
+async def _gen_cache(cache: Path):
+    global _cache_version
+    paths = list(_iter_crx(cache))
+    infos = await asyncio.gather(*(asyncio.to_thread(_hash_one, path) for path in paths))
+    for info in infos:
+        _by_id[info.extension_id][info.version] = info
+    _cache_version += 1
 
 
 def _get_cleanup_ctx_callback(
@@ -161,12 +226,12 @@ def _get_cleanup_ctx_callback(
     extension_keys: list[web.AppKey[Task[None]]]
 ) -> Callable[[web.Application], AsyncIterator[None]]:
     async def callback(app: web.Application):
-        _gen_cache(cache_path)
+        global _cache_version
+        await _gen_cache(cache_path)
 
         app[watcher_key] = create_task(_watch_cache(cache_path))
 
-        for extension_key in extension_keys:
-            extension_id = config.extensions[extension_keys.index(extension_key)]
+        for extension_key, extension_id in zip(extension_keys, config.extensions, strict=True):
             downloader = ExtensionDownloader(
                 extension_id,
                 config.interval,
@@ -185,50 +250,85 @@ def _get_cleanup_ctx_callback(
         _ = app[watcher_key].cancel()
         await app[watcher_key]
 
-        _cache.clear()
+        _by_id.clear()
+        _cache_version += 1
     return callback
 
 
+def _build_manifest(
+    absolute_base: str,
+    codebase_roots: dict[str, str],
+    infos: list[ExtensionInfo],
+) -> bytes:
+    update_checks: dict[str, list[str]] = {}
+    for info in infos:
+        codebase_root = codebase_roots.get(
+            info.extension_id,
+            absolute_base + info.extension_id + "/",
+        )
+        codebase = codebase_root + info.version + ".crx"
+        update_checks.setdefault(info.extension_id, []).append(
+            '<updatecheck codebase={} version={} status="ok" size="{}" hash_sha256={}/>'.format(
+                quoteattr(codebase),
+                quoteattr(info.version),
+                info.size,
+                quoteattr(info.hash_sha256),
+            )
+        )
+    parts = [_XML_DECLARATION, _XML_ROOT_OPEN]
+    for extension_id, checks in update_checks.items():
+        parts.append("<app appid={}>".format(quoteattr(extension_id)))
+        parts.extend(checks)
+        parts.append("</app>")
+    parts.append("</gupdate>\n")
+    return "".join(parts).encode("utf-8")
+
+
 def _get_handler(
     config: Config,
     prefix: str
 ) -> Callable[[web.Request], Coroutine[Any, Any, web.Response]]:
+    absolute_base = config.base + prefix + "/"
+    codebase_roots = {
+        extension_id: absolute_base + extension_id + "/"
+        for extension_id in config.extensions
+    }
+    manifest_cache: dict[frozenset[tuple[str, str]], tuple[int, bytes, str]] = {}
+    manifest_cache_maxsize = 1024
+
     async def handler(request: web.Request) -> web.Response:
-        absolute_base = config.base + prefix + "/"
-        root = Element("gupdate")
-        root.attrib["xmlns"] = "http://www.google.com/update2/response"
-        root.attrib["protocol"] = "2.0"
         xs = request.query.getall("x") if "x" in request.query else []
         filters = _get_filters(xs)
-        infos: list[ExtensionInfo] = []
-        if len(filters) > 0:
-            for extension_id, extension_version in filters:
-                for info in _iter_extension_info(extension_id, extension_version):
-                    infos.append(info)
+        filters_key = frozenset(filters)
+        cached = manifest_cache.get(filters_key)
+        if cached is not None and cached[0] == _cache_version:
+            _, xml, etag_value = cached
         else:
-            for info in _iter_extension_info():
-                infos.append(info)
-
-        for info in infos:
-            extension_path = info.extension_id + "/" + info.version + ".crx"
-            app = root.find("./app[@appid='{}']".format(info.extension_id))
-            if app is None:
-                app = Element("app")
-                app.attrib["appid"] = info.extension_id
-                root.append(app)
-            update_check = Element("updatecheck")
-            update_check.attrib["codebase"] = absolute_base + extension_path
-            update_check.attrib["version"] = info.version
-            update_check.attrib["status"] = "ok"
-            update_check.attrib["size"] = str(info.size)
-            update_check.attrib["hash_sha256"] = info.hash_sha256
-            app.append(update_check)
-        indent(root)
-        xml: bytes = tostring(root, encoding="utf-8", xml_declaration=True)
+            infos: list[ExtensionInfo] = []
+            if len(filters) > 0:
+                for extension_id, extension_version in filters:
+                    for info in _iter_extension_info(extension_id, extension_version):
+                        infos.append(info)
+            else:
+                for info in _iter_extension_info():
+                    infos.append(info)
+
+            xml = _build_manifest(absolute_base, codebase_roots, infos)
+            etag_value = hashlib.sha256(xml).hexdigest()[:16]
+            if len(manifest_cache) >= manifest_cache_maxsize:
+                manifest_cache.clear()
+            manifest_cache[filters_key] = (_cache_version, xml, etag_value)
+        headers = {
+            "ETag": '"' + etag_value + '"',
+            "Cache-Control": "public, max-age=60",
+        }
+        if any(etag.value == etag_value for etag in request.if_none_match or ()):
+            return web.Response(status=HTTPStatus.NOT_MODIFIED, headers=headers)
         return web.Response(
-            body=xml + "\n".encode("utf-8"),
+            body=xml,
             content_type="application/xml",
-            charset="utf-8"
+            charset="utf-8",
+            headers=headers
         )
     return handler
 